@@ -0,0 +1,5 @@
+import logging
+
+# Configure professional logging once for the package, unless the host application already did
+if not logging.getLogger().handlers:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
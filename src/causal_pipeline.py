@@ -4,12 +4,32 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import logging
+import multiprocessing
 import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+if __package__:
+    from .fast_psm import propensity_scores, matched_ate
+else:  # Running as a script (python src/causal_pipeline.py)
+    from fast_psm import propensity_scores, matched_ate
 
-# Configure professional logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("CausalEngine")
 
+# Each spawned refutation worker re-imports DoWhy (~3 s), about as long as one refuter takes on
+# 10k rows, so parallel refutation only pays off on multi-core hosts with much larger datasets.
+PARALLEL_REFUTATION_MIN_ROWS = 100_000
+
+
+def _refute_from_payload(payload, method_name, random_seed):
+    """
+    Worker entry point for validate_robustness(): unpickles (model, estimand, estimate) and runs one refuter.
+    """
+    model, identified_estimand, estimate = pickle.loads(payload)
+    return model.refute_estimate(identified_estimand, estimate, method_name=method_name, random_seed=random_seed)
+
+
 class CausalIntelligenceEngine:
     """
     A production-grade pipeline for Causal Inference using DoWhy.
@@ -20,22 +40,62 @@ class CausalIntelligenceEngine:
         """
         Initialize the engine with dataset and causal definitions.
         
-        :param data: Pandas DataFrame containing the experiment data.
+        :param data: Pandas DataFrame (or dict of column arrays, e.g. from DataLoader.generate_arrays())
+                     containing the experiment data.
         :param treatment_col: Name of the column representing the intervention (e.g., 'used_new_feature').
         :param outcome_col: Name of the column representing the result (e.g., 'total_spend').
         :param confounders: List of columns that influence both treatment and outcome (e.g., 'age').
         """
-        self.df = data
+        # DoWhy's propensity estimators add a 'propensity_score' column to the model's data.
+        # A shallow copy keeps that column out of the caller's DataFrame without duplicating the data.
+        if isinstance(data, pd.DataFrame):
+            self.df = data.copy(deep=False)
+        else:
+            # Freshly generated column arrays are wrapped without another copy
+            self.df = pd.DataFrame(data, copy=False)
         self.treatment = treatment_col
         self.outcome = outcome_col
         self.confounders = confounders
         self.model = None
         self.identified_estimand = None
         self.estimate = None
+        self.propensity_scores_ = None  # P(treatment=1 | confounders), set by estimate_effect()
+        self.custom_psm_estimate_ = None  # ATE from the "custom_numba_psm" method
+
+        # Materialize the columns used by the numeric paths once, instead of per method call
+        self._t = None  # Built on first use; only the binary-treatment paths need it
+        self._y = self.df[outcome_col].to_numpy()
+        self._X = None  # Built on first use; DoWhy's own estimators also accept non-numeric confounders
 
         # Ensure output directory exists for plots
         os.makedirs("notebooks/plots", exist_ok=True)
 
+    @property
+    def treatment_values(self):
+        """
+        Treatment column as a boolean array (True = treated).
+        Used by naive_diff(), ipw_effect() and "custom_numba_psm", which require a binary 0/1 treatment;
+        DoWhy estimators that handle continuous treatments don't go through it.
+        """
+        if self._t is None:
+            treatment_series = self.df[self.treatment]
+            if not treatment_series.isin([0, 1]).all():
+                raise ValueError(f"Treatment column '{self.treatment}' must be binary (0/1) with no missing values.")
+            self._t = (treatment_series == 1).to_numpy()
+        return self._t
+
+    @property
+    def outcome_values(self):
+        """Outcome column as an array."""
+        return self._y
+
+    @property
+    def confounder_values(self):
+        """Confounder columns as a float64 matrix (n_units x n_confounders). Requires numeric confounders."""
+        if self._X is None:
+            self._X = self.df[self.confounders].to_numpy(dtype=np.float64)
+        return self._X
+
     def create_causal_graph(self):
         """
         Step 1: Model the problem.
@@ -57,7 +117,7 @@ class CausalIntelligenceEngine:
             self.model.view_model(file_name="notebooks/plots/causal_graph", file_format="png")
             logger.info("Causal graph saved to notebooks/plots/causal_graph.png")
         except Exception as e:
-            logger.warning(f"Could not save graph image (likely missing Graphviz binary): {e}")
+            logger.warning("Could not save graph image (likely missing Graphviz binary): %s", e)
 
     def identify_effect(self):
         """
@@ -71,7 +131,7 @@ class CausalIntelligenceEngine:
         self.identified_estimand = self.model.identify_effect(proceed_when_unidentifiable=True)
         
         # Log the identification strategy (Crucial for debugging)
-        logger.info(f"Identified Estimand: {self.identified_estimand}")
+        logger.info("Identified Estimand: %s", self.identified_estimand)
 
     def estimate_effect(self, method="backdoor.propensity_score_matching"):
         """
@@ -79,48 +139,143 @@ class CausalIntelligenceEngine:
         Calculates the actual numeric value of the impact.
         
         :param method: The statistical method to use. Default is Propensity Score Matching (PSM).
+                       "custom_numba_psm" bypasses DoWhy's estimator and runs the compiled matcher in fast_psm.
         """
-        logger.info(f"Step 3: Estimating Effect using {method}...")
+        logger.info("Step 3: Estimating Effect using %s...", method)
+
+        if method == "custom_numba_psm":
+            self.propensity_scores_ = propensity_scores(self.confounder_values, self.treatment_values)
+            # Kept apart from self.estimate: this is a plain number, not a refutable DoWhy estimate
+            self.custom_psm_estimate_ = matched_ate(self.propensity_scores_, self.treatment_values, self._y)
+            logger.info("\n*** CAUSAL ESTIMATE ***\nMean Estimate: %s", self.custom_psm_estimate_)
+            return self.custom_psm_estimate_
         
         self.estimate = self.model.estimate_effect(
             self.identified_estimand,
             method_name=method,
             target_units="ate" # Average Treatment Effect
         )
+
+        # Propensity-based DoWhy estimators attach their fitted scores; keep them for ipw_effect()
+        scores = getattr(self.estimate, "propensity_scores", None)
+        self.propensity_scores_ = None if scores is None else np.asarray(scores, dtype=np.float64)
         
-        logger.info(f"\n*** CAUSAL ESTIMATE ***\nMean Estimate: {self.estimate.value}")
+        logger.info("\n*** CAUSAL ESTIMATE ***\nMean Estimate: %s", self.estimate.value)
         return self.estimate.value
 
-    def validate_robustness(self):
+    def naive_diff(self):
+        """
+        Naive Estimate: raw difference in mean outcome between treated and control users.
+        Biased by the confounders; reported alongside the causal estimate for comparison.
+        """
+        treated = self.treatment_values
+        return self._y[treated].mean() - self._y[~treated].mean()
+
+    def ipw_effect(self):
+        """
+        Average Treatment Effect by (normalized) Inverse Propensity Weighting.
+
+        Uses propensity_scores_ as left by the most recent estimate_effect() call: DoWhy's scores
+        for a propensity-based DoWhy method, or the fast_psm logistic fit for "custom_numba_psm".
+        If that call produced none (e.g. a regression estimator), a logistic model is fitted here
+        on the float64 confounders and cached in propensity_scores_.
+        """
+        treated = self.treatment_values
+        if self.propensity_scores_ is None:
+            self.propensity_scores_ = propensity_scores(self.confounder_values, treated)
+
+        scores = self.propensity_scores_
+        # A score of exactly 0 or 1 would make its inverse weight inf (and the average nan)
+        if np.any((scores <= 0) | (scores >= 1)):
+            raise ValueError("Propensity scores must lie strictly between 0 and 1 for IPW (positivity violated).")
+        treated_mean = np.average(self._y[treated], weights=1 / scores[treated])
+        control_mean = np.average(self._y[~treated], weights=1 / (1 - scores[~treated]))
+        return treated_mean - control_mean
+
+    def validate_robustness(self, parallel=False):
         """
         Step 4: Refutation (The 'FAANG' Standard).
         Validates the result by challenging the assumptions.
+
+        :param parallel: Run the two refuters in spawned worker processes. Each worker re-imports the
+                         calling script, so only enable this when the entry point is guarded with
+                         ``if __name__ == "__main__":`` (otherwise the workers re-run the whole script
+                         before the pool breaks). Each worker also pays a fresh DoWhy import (~3 s),
+                         so this is slower than serial on a single CPU or on small datasets; see
+                         PARALLEL_REFUTATION_MIN_ROWS. If the workers cannot start or die, or the model
+                         cannot be pickled, the refuters run serially in this process instead.
         """
+        if self.estimate is None:
+            raise ValueError("No DoWhy estimate to refute. Run estimate_effect() with a DoWhy method first.")
+
         logger.info("Step 4: Validating Robustness (Refutation Tests)...")
         
         # Test 1: Random Common Cause (Adds a random confounder; estimate should not change)
-        refute_rcc = self.model.refute_estimate(
-            self.identified_estimand,
-            self.estimate,
-            method_name="random_common_cause"
-        )
-        logger.info(f"Refutation (Random Common Cause): {refute_rcc}")
-
         # Test 2: Placebo Treatment (Replaces treatment with random noise; effect should go to 0)
-        refute_placebo = self.model.refute_estimate(
-            self.identified_estimand,
-            self.estimate,
-            method_name="placebo_treatment_refuter"
-        )
-        logger.info(f"Refutation (Placebo Treatment): {refute_placebo}")
+        # The two refuters are independent and each re-runs the estimator, so run them side by side.
+        methods = ("random_common_cause", "placebo_treatment_refuter")
+        # One distinct seed per refuter, drawn from the global RNG so repeat calls don't replay the same draws
+        seeds = [int(seed) for seed in np.random.randint(0, 2**31 - 1, size=len(methods))]
+        # Serialize once up front: a failure here is the only one that means "not picklable";
+        # anything raised by a refuter inside a worker propagates unchanged from f.result().
+        payload = None
+        if parallel:
+            try:
+                payload = pickle.dumps((self.model, self.identified_estimand, self.estimate))
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                logger.warning("Running refutations serially (model is not picklable): %s", e)
+
+        results = None
+        if payload is not None:
+            executor = futures = None
+            try:
+                # Spawned (not forked) workers: forking after a Numba parallel kernel has run
+                # leaves the parent hanging at interpreter exit
+                executor = ProcessPoolExecutor(max_workers=len(methods), mp_context=multiprocessing.get_context("spawn"))
+                futures = [
+                    executor.submit(_refute_from_payload, payload, m, seed)
+                    for m, seed in zip(methods, seeds)
+                ]
+            # Hosts that cannot create the pool's queues, semaphores or processes, or a worker dying at start-up
+            except (BrokenProcessPool, OSError, NotImplementedError) as e:
+                logger.warning("Running refutations serially (worker pool could not start): %s", e)
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+                futures = None
+
+            if futures is not None:
+                with executor:
+                    try:
+                        # Errors raised by a refuter itself propagate unchanged
+                        results = [f.result() for f in futures]
+                    except BrokenProcessPool as e:
+                        logger.warning("Running refutations serially (worker pool failed): %s", e)
+
+        if results is None:
+            results = [
+                self.model.refute_estimate(self.identified_estimand, self.estimate, method_name=m, random_seed=seed)
+                for m, seed in zip(methods, seeds)
+            ]
+        refute_rcc, refute_placebo = results
+
+        # Refuter summaries are expensive to render; skip them entirely when INFO is disabled
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Refutation (Random Common Cause): %s", refute_rcc)
+            logger.info("Refutation (Placebo Treatment): %s", refute_placebo)
         
         return refute_rcc, refute_placebo
 
 # --- Execution Block for Testing ---
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # Load the data we generated in Hour 1
     try:
-        df = pd.read_csv("data/raw/experiment_data.csv")
+        # pyarrow parses multi-threaded; fall back to the default C engine if it isn't installed
+        try:
+            df = pd.read_csv("data/raw/experiment_data.csv", engine="pyarrow")
+        except ImportError:
+            df = pd.read_csv("data/raw/experiment_data.csv")
         
         # Initialize the engine
         engine = CausalIntelligenceEngine(
@@ -134,9 +289,13 @@ if __name__ == "__main__":
         engine.create_causal_graph()
         engine.identify_effect()
         estimate = engine.estimate_effect()
-        engine.validate_robustness()
+        # Parallel workers only beat their DoWhy import cost on multi-core hosts with large data
+        engine.validate_robustness(
+            parallel=(os.cpu_count() or 1) >= 2 and len(df) >= PARALLEL_REFUTATION_MIN_ROWS
+        )
         
-        print(f"\nFinal Result: The new feature causes an increase of ${estimate:.2f} in spending.")
+        print(f"\nNaive Estimate: ${engine.naive_diff():.2f} (biased by confounders)")
+        print(f"Final Result: The new feature causes an increase of ${estimate:.2f} in spending.")
         
     except FileNotFoundError:
         logger.error("Data file not found. Please run src/data_loader.py first.")
\ No newline at end of file
@@ -0,0 +1,99 @@
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.neighbors import NearestNeighbors
+
+# Numba is optional: when installed, the matched-outcome averaging runs as a parallel
+# compiled loop; otherwise the equivalent vectorized NumPy expression is used.
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True)
+    def _mean_matched_difference(unit_y, match_y, idx):
+        """
+        Average of unit_y[i] - match_y[idx[i]] over all units, in a single pass.
+        """
+        total = 0.0
+        for i in prange(idx.shape[0]):
+            total += unit_y[i] - match_y[idx[i]]
+        return total / idx.shape[0]
+else:
+    def _mean_matched_difference(unit_y, match_y, idx):
+        """
+        NumPy fallback for the matched-difference kernel.
+        """
+        return float(np.mean(unit_y - match_y[idx]))
+
+
+def propensity_scores(X, treatment):
+    """
+    Fits a logistic propensity model P(treatment=1 | X) and returns the score for every unit.
+
+    :param X: 2D array of confounders (n_units x n_confounders).
+    :param treatment: Boolean array marking treated units.
+    """
+    propensity_model = LogisticRegression()
+    propensity_model.fit(X, treatment)
+    return propensity_model.predict_proba(X)[:, 1]
+
+
+def _nearest_match(source_scores, target_scores):
+    """
+    For each source unit, returns the int32 index of the target unit with the closest propensity score.
+    """
+    # Discrete confounders give only a handful of distinct scores, so most queries are exact ties.
+    # Use the same tree as DoWhy's PSM estimator so ties resolve to the same matched unit.
+    neighbors = NearestNeighbors(n_neighbors=1, algorithm="ball_tree").fit(target_scores.reshape(-1, 1))
+    idx = neighbors.kneighbors(source_scores.reshape(-1, 1), return_distance=False)
+    return idx.ravel().astype(np.int32)
+
+
+def matched_ate(scores, treatment, outcome):
+    """
+    Average Treatment Effect by 1-nearest-neighbor matching on the propensity score.
+    Mirrors DoWhy's PSM estimator: ATT (treated matched to controls) and ATC (controls
+    matched to treated) are combined, weighted by group size.
+
+    :param scores: Propensity score for every unit.
+    :param treatment: Boolean array marking treated units.
+    :param outcome: Outcome value for every unit.
+    """
+    treatment = np.asarray(treatment, dtype=bool)
+    treated_scores, control_scores = scores[treatment], scores[~treatment]
+    treated_y = np.ascontiguousarray(outcome[treatment], dtype=np.float64)
+    control_y = np.ascontiguousarray(outcome[~treatment], dtype=np.float64)
+
+    if treated_y.size == 0 or control_y.size == 0:
+        raise ValueError("Matching requires at least one treated and one control unit.")
+
+    att = _mean_matched_difference(treated_y, control_y, _nearest_match(treated_scores, control_scores))
+    atc = -_mean_matched_difference(control_y, treated_y, _nearest_match(control_scores, treated_scores))
+    return (att * treated_y.size + atc * control_y.size) / treatment.size
+
+
+if __name__ == "__main__":
+    # Parity check: the custom matcher must reproduce DoWhy's PSM estimate on the same data
+    import logging
+    import pandas as pd
+    from causal_pipeline import CausalIntelligenceEngine
+
+    logging.basicConfig(level=logging.WARNING)
+
+    df = pd.read_csv("data/raw/experiment_data.csv")
+    engine = CausalIntelligenceEngine(
+        data=df,
+        treatment_col="used_new_feature",
+        outcome_col="total_spend",
+        confounders=["account_age", "is_power_user"]
+    )
+    engine.create_causal_graph()
+    engine.identify_effect()
+    dowhy_estimate = engine.estimate_effect()
+    custom_estimate = engine.estimate_effect(method="custom_numba_psm")
+
+    assert np.isclose(custom_estimate, dowhy_estimate, rtol=1e-9, atol=0), (custom_estimate, dowhy_estimate)
+    print(f"PSM parity OK: custom {custom_estimate!r} vs DoWhy {dowhy_estimate!r}")